@@ -2,13 +2,30 @@
 """Simple Whisper Web UI - uses openai-whisper with ROCm/PyTorch"""
 
 import tempfile
+import hashlib
+import json
 import os
+import queue
+import sqlite3
+import subprocess
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import closing, nullcontext
+from dataclasses import replace
 from pathlib import Path
+from typing import Literal
 
-from fastapi import FastAPI, UploadFile, File
+from fastapi import FastAPI, UploadFile, File, Form, HTTPException
+from fastapi.concurrency import run_in_threadpool
 from fastapi.responses import HTMLResponse
 from fastapi.staticfiles import StaticFiles
+import numpy as np
 import whisper
+from whisper.audio import HOP_LENGTH, N_FRAMES, N_SAMPLES, SAMPLE_RATE
+from whisper.decoding import DecodingOptions, DecodingTask, LogitFilter
+from whisper.tokenizer import LANGUAGES, TO_LANGUAGE_CODE
 import torch
 
 app = FastAPI()
@@ -17,9 +34,40 @@ app = FastAPI()
 device = "cuda" if torch.cuda.is_available() else "cpu"
 print(f"Loading Whisper model on {device}...")
 print(f"GPU: {torch.cuda.get_device_name(0) if torch.cuda.is_available() else 'N/A'}")
-model = whisper.load_model("medium", device=device)  # Change to "small", "medium", "large" as needed
+MODEL_NAME = "medium"  # Change to "small", "medium", "large" as needed
+model = whisper.load_model(MODEL_NAME, device=device)
 print("Model loaded!")
 
+# Load-aware downgrade: opt-in requests go to a smaller model while the primary is backed up
+FALLBACK_MODEL = "small"          # None disables the fallback model
+QUEUE_DEPTH_SLO = 4               # Downgrade once this many requests wait on the primary model...
+WAIT_SLO = 20.0                   # ...or the projected wait exceeds this many seconds
+QUEUE_DRAINED = 1                 # Switch back once the primary backlog is down to this
+fallback_model = whisper.load_model(FALLBACK_MODEL, device=device) if FALLBACK_MODEL else None
+
+# Latency-budget decoding (used when a request sends a `budget` in seconds)
+DEFAULT_BUDGET = None             # Seconds per request, None = unlimited (plain model.transcribe)
+TEMPERATURES = (0.0, 0.2, 0.4, 0.6, 0.8, 1.0)
+MAX_FALLBACKS = 2                 # Temperature retries per 30s window in budget mode
+COMPRESSION_RATIO_THRESHOLD = 2.4
+LOGPROB_THRESHOLD = -1.0
+NO_SPEECH_THRESHOLD = 0.6
+REPETITION_NGRAM = 4              # Stop a window early once the same 4-token n-gram...
+REPETITION_LIMIT = 3              # ...has been emitted this many times in a row
+
+# Encoder-output cache: resubmitting the same audio with other options skips the encoder
+ENCODER_CACHE_BYTES = 512 << 20   # In-memory LRU of per-window encoder outputs, 0 = off
+ENCODER_CACHE_DIR = None          # Disk tier (.npy files) for windows evicted from memory, None = off
+ENCODER_DISK_BYTES = 4 << 30
+
+# Asynchronous jobs for long recordings (POST /jobs, GET /jobs/{id})
+JOBS_DB = "jobs.db"               # SQLite queue with per-window checkpoints
+JOBS_DIR = Path("jobs")           # Uploaded audio is kept here until its job finishes
+
+# Traffic capture for Replay.py (opt-in)
+CAPTURE_TRACE = None              # JSONL trace every /transcribe request is appended to, None = off
+CAPTURE_AUDIO = True              # Also keep the audio next to the trace (deduplicated by hash)
+
 HTML_PAGE = """
 <!DOCTYPE html>
 <html lang="en">
@@ -741,14 +789,517 @@ HTML_PAGE = """
 </html>
 """
 
+class EarlyStop(LogitFilter):
+    """Forces end-of-text when the decoder loops on an n-gram or the deadline passes."""
+
+    def __init__(self, sample_begin, eot, deadline=None):
+        self.sample_begin = sample_begin
+        self.eot = eot
+        self.deadline = deadline
+        self.repeated = False
+        self.expired = False
+
+    def looping(self, seq):
+        # Only back-to-back repeats; a phrase recurring across the window is normal speech
+        span = REPETITION_NGRAM * REPETITION_LIMIT
+        return len(seq) >= span and seq[-span:] == seq[-REPETITION_NGRAM:] * REPETITION_LIMIT
+
+    def apply(self, logits, tokens):
+        expired = self.deadline is not None and time.monotonic() >= self.deadline
+        self.expired = self.expired or expired
+        for i, seq in enumerate(tokens[:, self.sample_begin:].tolist()):
+            if expired or self.looping(seq):
+                self.repeated = self.repeated or not expired
+                logits[i, :] = -float("inf")
+                logits[i, self.eot] = 0
+
+
+class BudgetDecodingTask(DecodingTask):
+    """Whisper's decoding task with an EarlyStop filter applied after the built-in ones."""
+
+    def __init__(self, model, options, deadline=None):
+        super().__init__(model, options)
+        self.early_stop = EarlyStop(self.sample_begin, self.tokenizer.eot, deadline)
+        self.logit_filters.append(self.early_stop)
+
+
+def silent(result):
+    return result.no_speech_prob > NO_SPEECH_THRESHOLD and result.avg_logprob < LOGPROB_THRESHOLD
+
+
+def failed(result):
+    # Like whisper's decode_with_fallback, silence is not retried at higher temperatures
+    if silent(result):
+        return False
+    return (
+        result.compression_ratio > COMPRESSION_RATIO_THRESHOLD
+        or result.avg_logprob < LOGPROB_THRESHOLD
+    )
+
+
+def decode_window(model, features, options, deadline, max_fallbacks, stats):
+    """Decode one window's encoder output, retrying at higher temperatures at most `max_fallbacks` times."""
+    best = None
+    for attempt, temperature in enumerate(TEMPERATURES[:max_fallbacks + 1]):
+        if attempt:
+            stats["fallbacks"] += 1
+        task = BudgetDecodingTask(model, replace(options, temperature=temperature), deadline)
+        result = task.run(features)[0]
+        if task.early_stop.repeated:
+            stats["early_stops"] += 1
+        if task.early_stop.expired:
+            # A cut-off attempt (often a bare forced EOT scoring logprob 0) never beats a finished one
+            stats["degraded"] = True
+            best = best or result
+            break
+        if best is None or result.avg_logprob > best.avg_logprob:
+            best = result
+        if silent(result) or (not failed(result) and not task.early_stop.repeated):
+            return result
+    return best
+
+
+class EncoderCache:
+    """LRU of per-window encoder outputs bounded by bytes, spilling to an optional disk tier."""
+
+    def __init__(self, max_bytes, disk_dir=None, disk_bytes=0):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.bytes = 0
+        self.disk_dir = Path(disk_dir) if disk_dir else None
+        self.disk_bytes = disk_bytes
+        self.disk = OrderedDict()     # File name -> size, oldest first
+        self.disk_held = 0
+        self.hits = self.disk_hits = self.misses = 0
+        self.lengths = OrderedDict()  # Audio key -> sample count, so full hits skip ffmpeg
+        self.lock = threading.Lock()
+        if self.disk_dir:
+            self.disk_dir.mkdir(parents=True, exist_ok=True)
+            for tmp in self.disk_dir.glob("*.tmp"):
+                tmp.unlink(missing_ok=True)
+            for path in sorted(self.disk_dir.glob("*.npy"), key=lambda p: p.stat().st_mtime):
+                self.disk[path.name] = path.stat().st_size
+                self.disk_held += path.stat().st_size
+
+    @staticmethod
+    def file_name(key):
+        return hashlib.sha256(repr(key).encode()).hexdigest() + ".npy"
+
+    def length(self, audio_key):
+        with self.lock:
+            if audio_key in self.lengths:
+                self.lengths.move_to_end(audio_key)
+            return self.lengths.get(audio_key)
+
+    def set_length(self, audio_key, n_samples):
+        with self.lock:
+            self.lengths[audio_key] = n_samples
+            while len(self.lengths) > 4096:
+                self.lengths.popitem(last=False)
+
+    def get(self, key):
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return self.entries[key]
+            name = self.file_name(key)
+            if name not in self.disk:
+                self.misses += 1
+                return None
+            self.disk.move_to_end(name)
+        try:
+            array = np.load(self.disk_dir / name)
+        except (OSError, ValueError):
+            # Evicted by another request in the meantime, or a file truncated by a crash
+            array = None
+        with self.lock:
+            if array is None:
+                self.misses += 1
+                self.disk_held -= self.disk.pop(name, 0)
+            else:
+                self.disk_hits += 1
+        if array is None:
+            (self.disk_dir / name).unlink(missing_ok=True)
+            return None
+        features = torch.from_numpy(array).to(device)
+        self.put(key, features)
+        return features
+
+    def put(self, key, features):
+        size = features.element_size() * features.nelement()
+        if size > self.max_bytes:
+            return
+        evicted = []
+        with self.lock:
+            if key in self.entries:
+                return
+            self.entries[key] = features
+            self.bytes += size
+            while self.bytes > self.max_bytes:
+                old_key, old = self.entries.popitem(last=False)
+                self.bytes -= old.element_size() * old.nelement()
+                evicted.append((old_key, old))
+        # Disk I/O happens outside the lock so lookups aren't blocked behind it
+        for old_key, old in evicted:
+            self.spill(old_key, old)
+
+    def spill(self, key, features):
+        if not self.disk_dir:
+            return
+        name = self.file_name(key)
+        with self.lock:
+            if name in self.disk:
+                return
+        # Write under a temporary name and rename, so a crash never leaves a partial .npy
+        path = self.disk_dir / name
+        tmp = path.with_name(f"{name}.{uuid.uuid4().hex}.tmp")
+        try:
+            with open(tmp, "wb") as f:
+                np.save(f, features.cpu().numpy())
+            os.replace(tmp, path)
+        except OSError as e:
+            tmp.unlink(missing_ok=True)
+            print(f"Encoder cache spill failed: {e}")
+            return
+        removed = []
+        with self.lock:
+            self.disk_held -= self.disk.pop(name, 0)
+            self.disk[name] = path.stat().st_size
+            self.disk_held += self.disk[name]
+            while self.disk_held > self.disk_bytes and self.disk:
+                old, old_size = self.disk.popitem(last=False)
+                self.disk_held -= old_size
+                removed.append(old)
+        for old in removed:
+            (self.disk_dir / old).unlink(missing_ok=True)
+
+    def stats(self):
+        lookups = self.hits + self.disk_hits + self.misses
+        return {
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": round((self.hits + self.disk_hits) / lookups, 3) if lookups else None,
+            "windows": len(self.entries),
+            "bytes": self.bytes,
+            "disk_windows": len(self.disk),
+            "disk_bytes": self.disk_held,
+        }
+
+
+encoder_cache = (
+    EncoderCache(ENCODER_CACHE_BYTES, ENCODER_CACHE_DIR, ENCODER_DISK_BYTES)
+    if ENCODER_CACHE_BYTES else None
+)
+
+
+def transcribe_with_budget(
+    model, audio_path, deadline=None, max_fallbacks=MAX_FALLBACKS,
+    done=(), on_start=None, on_window=None, lock=None,
+    cache_key=None, task="transcribe", language=None, prompt=None,
+):
+    """Windowed transcription that returns the best text so far once `deadline` has passed.
+
+    `deadline` is an absolute time.monotonic() value, so time spent queued counts against it.
+
+    `done` holds (text, language) for windows already decoded by an earlier run, which are
+    skipped. `on_start(total)` is called once the number of windows is known and
+    `on_window(index, total, text, language)` after every new window, and
+    `lock` is held only while a window decodes so other requests can interleave. With a
+    `cache_key` (model and audio hash), encoder outputs are looked up in and added to the
+    encoder cache, and the audio is only decoded and the log-mel computed if a window is missing.
+    """
+    caching = bool(cache_key and encoder_cache)
+    audio = mel = None
+    n_samples = encoder_cache.length(cache_key) if caching else None
+    if n_samples is None:
+        audio = whisper.load_audio(audio_path)
+        n_samples = len(audio)
+        if caching:
+            encoder_cache.set_length(cache_key, n_samples)
+    n_frames = n_samples // HOP_LENGTH
+    texts = [text for text, _ in done]
+    options = DecodingOptions(
+        task=task,
+        language=done[0][1] if done else language,
+        prompt=next((text for text in reversed(texts) if text), prompt),
+        without_timestamps=True,
+        fp16=device == "cuda",
+    )
+    stats = {"fallbacks": 0, "early_stops": 0, "degraded": False}
+    windows = range(0, n_frames, N_FRAMES)
+    if on_start:
+        on_start(len(windows))
+
+    for index, seek in enumerate(windows):
+        if index < len(done):
+            continue
+        if deadline is not None and time.monotonic() >= deadline:
+            stats["degraded"] = True
+            break
+        key = (cache_key, index)
+        features = encoder_cache.get(key) if caching else None
+        with lock or nullcontext():
+            if features is None:
+                if audio is None:
+                    audio = whisper.load_audio(audio_path)
+                if mel is None:
+                    mel = whisper.log_mel_spectrogram(audio, model.dims.n_mels, padding=N_SAMPLES)
+                segment = whisper.pad_or_trim(mel[:, seek:seek + N_FRAMES], N_FRAMES)
+                segment = segment.to(model.device).unsqueeze(0)
+                # Encode once per window so temperature fallbacks only re-run the decoder
+                with torch.no_grad():
+                    features = model.embed_audio(segment.half() if options.fp16 else segment)
+                if caching:
+                    encoder_cache.put(key, features)
+            result = decode_window(model, features, options, deadline, max_fallbacks, stats)
+        # Pin the language detected on the first window, condition on the previous text
+        options = replace(options, language=result.language)
+        text = result.text.strip()
+        if silent(result):
+            text = ""
+        else:
+            options = replace(options, prompt=None if result.temperature > 0.5 else result.text)
+        texts.append(text)
+        if on_window:
+            on_window(index, len(windows), text, options.language)
+        if stats["degraded"]:
+            break
+
+    return {
+        "text": " ".join(t for t in texts if t),
+        "language": options.language,
+        "duration": round(n_samples / SAMPLE_RATE, 1),
+        **stats,
+    }
+
+
+def run_whisper(model, audio_path, deadline=None, cache_key=None, task="transcribe", language=None, prompt=None):
+    if deadline is not None or cache_key:
+        # Without a budget only the encoder cache is wanted, so keep the full fallback ladder
+        max_fallbacks = MAX_FALLBACKS if deadline is not None else len(TEMPERATURES) - 1
+        return transcribe_with_budget(
+            model, audio_path, deadline, max_fallbacks=max_fallbacks,
+            cache_key=cache_key, task=task, language=language, prompt=prompt,
+        )
+
+    result = model.transcribe(audio_path, task=task, language=language, initial_prompt=prompt)
+    return {
+        "text": result["text"].strip(),
+        "language": result.get("language"),
+        "duration": round(result.get("segments", [{}])[-1].get("end", 0), 1) if result.get("segments") else None,
+    }
+
+
+class ModelSlot:
+    """A loaded model that runs one request at a time and tracks its backlog."""
+
+    def __init__(self, name, model):
+        self.name = name
+        self.model = model
+        self.lock = threading.Lock()
+        self.pending = 0
+        self.jobs = 0                 # Running /jobs, which share the lock window by window
+        self.avg_seconds = 0.0
+
+    def depth(self):
+        return self.pending + self.jobs
+
+    def projected_wait(self):
+        return self.depth() * self.avg_seconds
+
+    def run(self, *args, **kwargs):
+        with self.lock:
+            start = time.time()
+            result = run_whisper(self.model, *args, **kwargs)
+        elapsed = time.time() - start
+        self.avg_seconds = elapsed if not self.avg_seconds else 0.8 * self.avg_seconds + 0.2 * elapsed
+        return result
+
+    async def submit(self, *args, **kwargs):
+        self.pending += 1
+        try:
+            return await run_in_threadpool(self.run, *args, **kwargs)
+        finally:
+            self.pending -= 1
+
+
+primary = ModelSlot(MODEL_NAME, model)
+fallback = ModelSlot(FALLBACK_MODEL, fallback_model) if fallback_model else None
+downgrading = False
+
+
+def pick_slot(allow_downgrade):
+    """Route opt-in requests to the fallback model while the primary is over its SLO."""
+    global downgrading
+    if primary.depth() >= QUEUE_DEPTH_SLO or primary.projected_wait() > WAIT_SLO:
+        downgrading = True
+    elif primary.depth() <= QUEUE_DRAINED:
+        downgrading = False
+    return fallback if allow_downgrade and downgrading and fallback else primary
+
+
+def jobs_db():
+    db = sqlite3.connect(JOBS_DB)
+    db.row_factory = sqlite3.Row
+    return db
+
+
+def init_jobs():
+    """Create the job tables and return the ids of jobs a previous run left unfinished."""
+    JOBS_DIR.mkdir(exist_ok=True)
+    with closing(jobs_db()) as db, db:
+        db.execute("""CREATE TABLE IF NOT EXISTS jobs (
+            id TEXT PRIMARY KEY, status TEXT, audio_path TEXT, created REAL, finished REAL,
+            windows_done INTEGER DEFAULT 0, windows_total INTEGER, result TEXT, error TEXT)""")
+        db.execute("""CREATE TABLE IF NOT EXISTS windows (
+            job_id TEXT, idx INTEGER, text TEXT, language TEXT, PRIMARY KEY (job_id, idx))""")
+        rows = db.execute(
+            "SELECT id FROM jobs WHERE status IN ('queued', 'running') ORDER BY created"
+        ).fetchall()
+    return [row["id"] for row in rows]
+
+
+def run_job(job_id):
+    with closing(jobs_db()) as db, db:
+        job = db.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        done = [(row["text"], row["language"]) for row in db.execute(
+            "SELECT text, language FROM windows WHERE job_id = ? ORDER BY idx", (job_id,)
+        )]
+        db.execute("UPDATE jobs SET status = 'running' WHERE id = ?", (job_id,))
+
+    def store_total(total):
+        with closing(jobs_db()) as db, db:
+            db.execute("UPDATE jobs SET windows_total = ? WHERE id = ?", (total, job_id))
+
+    def checkpoint(index, total, text, language):
+        with closing(jobs_db()) as db, db:
+            db.execute(
+                "INSERT OR REPLACE INTO windows VALUES (?, ?, ?, ?)",
+                (job_id, index, text, language),
+            )
+            db.execute(
+                "UPDATE jobs SET windows_done = ?, windows_total = ? WHERE id = ?",
+                (index + 1, total, job_id),
+            )
+
+    if done:
+        print(f"Resuming job {job_id} at window {len(done)}")
+    # Counted as load so the downgrade SLO, /health and the gateway see a busy primary
+    primary.jobs += 1
+    try:
+        result = transcribe_with_budget(
+            model, job["audio_path"], max_fallbacks=len(TEMPERATURES) - 1,
+            done=done, on_start=store_total, on_window=checkpoint, lock=primary.lock,
+        )
+        status, error = "done", None
+    except Exception as e:
+        result, status, error = None, "failed", str(e)
+    finally:
+        primary.jobs -= 1
+
+    with closing(jobs_db()) as db, db:
+        db.execute(
+            "UPDATE jobs SET status = ?, result = ?, error = ?, finished = ? WHERE id = ?",
+            (status, json.dumps(result) if result else None, error, time.time(), job_id),
+        )
+    # Failed jobs keep their audio and checkpoints so POST /jobs/{id}/retry can resume them
+    if status == "done":
+        Path(job["audio_path"]).unlink(missing_ok=True)
+
+
+def probe_windows(audio_path):
+    """Estimate a file's 30s window count with ffprobe, None if that fails."""
+    try:
+        duration = subprocess.run(
+            ["ffprobe", "-v", "error", "-show_entries", "format=duration", "-of", "csv=p=0",
+             str(audio_path)],
+            capture_output=True, text=True, check=True,
+        ).stdout
+        n_frames = int(float(duration) * SAMPLE_RATE) // HOP_LENGTH
+    except (OSError, ValueError, subprocess.CalledProcessError):
+        return None
+    return -(-n_frames // N_FRAMES)
+
+
+def job_worker():
+    while True:
+        job_id = job_queue.get()
+        try:
+            run_job(job_id)
+        except Exception as e:
+            # e.g. "database is locked"; the job stays queued/running and resumes on restart
+            print(f"Job {job_id} crashed: {e}")
+
+
+job_queue = queue.Queue()
+for unfinished in init_jobs():
+    job_queue.put(unfinished)
+threading.Thread(target=job_worker, daemon=True).start()
+
+
+def capture_request(content, digest, filename, options, arrival, model_name, queue_depth,
+                    processing_time, error=None):
+    """Append one /transcribe request to the CAPTURE_TRACE file."""
+    trace = Path(CAPTURE_TRACE)
+    trace.parent.mkdir(parents=True, exist_ok=True)
+    if CAPTURE_AUDIO:
+        audio_dir = trace.with_suffix(".audio")
+        audio_dir.mkdir(parents=True, exist_ok=True)
+        audio_path = audio_dir / digest
+        if not audio_path.exists():
+            audio_path.write_bytes(content)
+    record = {
+        "arrival": round(arrival, 3),
+        "sha256": digest,
+        "bytes": len(content),
+        "filename": filename,
+        "options": options,
+        "model": model_name,
+        "queue_depth": queue_depth,
+        "processing_time": processing_time,
+        "error": error,
+    }
+    with capture_lock, open(trace, "a") as f:
+        f.write(json.dumps(record) + "\n")
+
+
+capture_lock = threading.Lock()
+
+
 @app.get("/", response_class=HTMLResponse)
 async def index():
     return HTML_PAGE
 
+@app.get("/health")
+async def health():
+    slots = [slot for slot in (primary, fallback) if slot]
+    return {
+        "status": "ok",
+        "queue_depth": sum(slot.depth() for slot in slots),
+        "projected_wait": round(max(slot.projected_wait() for slot in slots), 2),
+        "downgrading": downgrading,
+        "encoder_cache": encoder_cache.stats() if encoder_cache else None,
+    }
+
 @app.post("/transcribe")
-async def transcribe(file: UploadFile = File(...)):
-    import time
+async def transcribe(
+    file: UploadFile = File(...),
+    budget: float | None = Form(DEFAULT_BUDGET, gt=0),
+    allow_downgrade: bool = Form(False),
+    task: Literal["transcribe", "translate"] = Form("transcribe"),
+    language: str | None = Form(None),
+    prompt: str | None = Form(None),
+    reuse_encoder: bool = Form(False),
+):
     start = time.time()
+    deadline = time.monotonic() + budget if budget else None
+    if language:
+        # Accept codes ("de") and names ("german"), like whisper's CLI
+        language = TO_LANGUAGE_CODE.get(language.lower(), language.lower())
+        if language not in LANGUAGES:
+            raise HTTPException(status_code=422, detail=f"Unsupported language: {language}")
     
     # Save uploaded audio to temp file
     with tempfile.NamedTemporaryFile(suffix=".webm", delete=False) as tmp:
@@ -756,19 +1307,92 @@ async def transcribe(file: UploadFile = File(...)):
         tmp.write(content)
         tmp_path = tmp.name
     
+    digest = await run_in_threadpool(lambda: hashlib.sha256(content).hexdigest())
+    slot = pick_slot(allow_downgrade)
+    queue_depth = slot.depth()
+    decode = {"task": task, "language": language or None, "prompt": prompt or None}
+    error = None
     try:
         # Transcribe with whisper
-        result = model.transcribe(tmp_path)
+        cache_key = f"{slot.name}/{digest}" if reuse_encoder else None
+        result = await slot.submit(tmp_path, deadline, cache_key=cache_key, **decode)
         processing_time = round(time.time() - start, 2)
         
         return {
-            "text": result["text"].strip(),
-            "language": result.get("language"),
-            "duration": round(result.get("segments", [{}])[-1].get("end", 0), 1) if result.get("segments") else None,
+            **result,
+            "model": slot.name,
             "processing_time": processing_time
         }
+    except Exception as e:
+        error = str(e)
+        raise
     finally:
         os.unlink(tmp_path)
+        if CAPTURE_TRACE:
+            options = {"budget": budget, "allow_downgrade": allow_downgrade,
+                       "reuse_encoder": reuse_encoder, **decode}
+            # Best effort: a failing capture must not turn a finished transcription into a 500
+            try:
+                await run_in_threadpool(
+                    capture_request, content, digest, file.filename, options, start,
+                    slot.name, queue_depth, round(time.time() - start, 2), error,
+                )
+            except Exception as e:
+                print(f"Capture to {CAPTURE_TRACE} failed: {e}")
+
+@app.post("/jobs")
+async def create_job(file: UploadFile = File(...)):
+    job_id = uuid.uuid4().hex
+    audio_path = JOBS_DIR / f"{job_id}{Path(file.filename or '').suffix or '.webm'}"
+    with open(audio_path, "wb") as f:
+        while chunk := await file.read(1 << 20):
+            f.write(chunk)
+
+    # Estimated up front so queued jobs report progress; the worker stores the exact count
+    windows_total = await run_in_threadpool(probe_windows, audio_path)
+    with closing(jobs_db()) as db, db:
+        db.execute(
+            "INSERT INTO jobs (id, status, audio_path, created, windows_total) "
+            "VALUES (?, 'queued', ?, ?, ?)",
+            (job_id, str(audio_path), time.time(), windows_total),
+        )
+    job_queue.put(job_id)
+    return {"id": job_id, "status": "queued"}
+
+@app.post("/jobs/{job_id}/retry")
+async def retry_job(job_id: str):
+    with closing(jobs_db()) as db, db:
+        updated = db.execute(
+            "UPDATE jobs SET status = 'queued', error = NULL, finished = NULL "
+            "WHERE id = ? AND status = 'failed'",
+            (job_id,),
+        ).rowcount
+    if not updated:
+        raise HTTPException(status_code=409, detail="Only failed jobs can be retried")
+    job_queue.put(job_id)
+    return {"id": job_id, "status": "queued"}
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    with closing(jobs_db()) as db:
+        job = db.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if job is None:
+            raise HTTPException(status_code=404, detail="Unknown job")
+        texts = [row["text"] for row in db.execute(
+            "SELECT text FROM windows WHERE job_id = ? ORDER BY idx", (job_id,)
+        )]
+
+    return {
+        "id": job_id,
+        "status": job["status"],
+        "windows_done": job["windows_done"],
+        "windows_total": job["windows_total"],
+        "text": " ".join(t for t in texts if t),
+        "result": json.loads(job["result"]) if job["result"] else None,
+        "error": job["error"],
+        "created": job["created"],
+        "finished": job["finished"],
+    }
 
 if __name__ == "__main__":
     import uvicorn
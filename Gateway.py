@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+"""Whisper gateway - shards /transcribe across several App.py backends"""
+
+import argparse
+import asyncio
+import time
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, Request
+from fastapi.responses import HTMLResponse, JSONResponse, StreamingResponse
+import httpx
+
+HEALTH_INTERVAL = 2.0             # Seconds between /health polls of every backend
+HEALTH_TIMEOUT = 1.0
+FAIL_THRESHOLD = 2                # Eject a backend after this many failed checks in a row
+HOP_HEADERS = {"connection", "keep-alive", "transfer-encoding", "upgrade", "host"}
+
+
+class Backend:
+    """One App.py instance and what the gateway knows about its load."""
+
+    def __init__(self, url):
+        self.url = url.rstrip("/")
+        self.healthy = True
+        self.failures = 0
+        self.inflight = 0             # Requests this gateway has sent and not seen finish
+        self.external = 0             # Reported queue depth not accounted for by our inflight
+        self.last_check = None
+
+    def outstanding(self):
+        return self.inflight + self.external
+
+    def mark_failed(self):
+        self.failures += 1
+        if self.failures >= FAIL_THRESHOLD and self.healthy:
+            print(f"Ejecting backend {self.url}")
+            self.healthy = False
+
+    def mark_ok(self, queue_depth):
+        if not self.healthy:
+            print(f"Backend {self.url} is back")
+        self.healthy = True
+        self.failures = 0
+        self.external = max(queue_depth - self.inflight, 0)
+        self.last_check = time.time()
+
+
+backends = []
+client = None
+
+
+async def check(backend):
+    try:
+        response = await client.get(f"{backend.url}/health", timeout=HEALTH_TIMEOUT)
+        response.raise_for_status()
+        backend.mark_ok(int(response.json()["queue_depth"]))
+    except Exception:
+        # Any bad answer (unreachable, not JSON, no usable queue_depth) must not kill the poller
+        backend.mark_failed()
+
+
+async def poll_health():
+    while True:
+        await asyncio.gather(*(check(backend) for backend in backends))
+        await asyncio.sleep(HEALTH_INTERVAL)
+
+
+def pick_backend():
+    """The healthy backend with the least outstanding work, or None."""
+    healthy = [backend for backend in backends if backend.healthy]
+    return min(healthy, key=Backend.outstanding, default=None)
+
+
+@asynccontextmanager
+async def lifespan(app):
+    global client
+    client = httpx.AsyncClient(timeout=httpx.Timeout(None, connect=HEALTH_TIMEOUT))
+    poller = asyncio.create_task(poll_health())
+    yield
+    poller.cancel()
+    await client.aclose()
+
+
+app = FastAPI(lifespan=lifespan)
+
+
+@app.get("/", response_class=HTMLResponse)
+async def index():
+    backend = pick_backend()
+    if backend is None:
+        return HTMLResponse("No healthy backends", status_code=503)
+    response = await client.get(f"{backend.url}/")
+    return HTMLResponse(response.text, status_code=response.status_code)
+
+@app.get("/health")
+async def health():
+    return {
+        "status": "ok" if pick_backend() else "unavailable",
+        "queue_depth": sum(backend.outstanding() for backend in backends if backend.healthy),
+        "backends": [
+            {
+                "url": backend.url,
+                "healthy": backend.healthy,
+                "outstanding": backend.outstanding(),
+                "last_check": backend.last_check,
+            }
+            for backend in backends
+        ],
+    }
+
+@app.post("/transcribe")
+async def transcribe(request: Request):
+    backend = pick_backend()
+    if backend is None:
+        return JSONResponse({"error": "No healthy backends"}, status_code=503)
+
+    # Stream the upload straight through; the body can only be sent once, so no retries
+    headers = {k: v for k, v in request.headers.items() if k.lower() not in HOP_HEADERS}
+    upstream = client.build_request(
+        "POST", f"{backend.url}/transcribe", headers=headers, content=request.stream()
+    )
+    backend.inflight += 1
+    try:
+        response = await client.send(upstream, stream=True)
+    except Exception as e:
+        # Also covers the client disconnecting while its upload is being streamed
+        backend.inflight -= 1
+        if not isinstance(e, httpx.HTTPError):
+            raise
+        backend.mark_failed()
+        return JSONResponse({"error": f"Backend {backend.url} failed: {e}"}, status_code=502)
+
+    async def body():
+        try:
+            async for chunk in response.aiter_raw():
+                yield chunk
+        finally:
+            await response.aclose()
+            backend.inflight -= 1
+
+    return StreamingResponse(
+        body(),
+        status_code=response.status_code,
+        headers={k: v for k, v in response.headers.items() if k.lower() not in HOP_HEADERS},
+    )
+
+
+def stub_app(delay):
+    """A model-free stand-in for App.py, for exercising the gateway on localhost."""
+    stub = FastAPI()
+    pending = 0
+
+    @stub.get("/health")
+    async def stub_health():
+        return {"status": "ok", "queue_depth": pending}
+
+    @stub.post("/transcribe")
+    async def stub_transcribe(request: Request):
+        nonlocal pending
+        pending += 1
+        try:
+            size = sum([len(chunk) async for chunk in request.stream()])
+            await asyncio.sleep(delay)
+            return {"text": f"stub received {size} bytes", "processing_time": delay}
+        finally:
+            pending -= 1
+
+    return stub
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--backend", action="append", default=[],
+                        help="App.py base URL, e.g. http://127.0.0.1:8001 (repeatable)")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--stub", type=float, metavar="DELAY",
+                        help="Run a stub backend that answers after DELAY seconds instead")
+    args = parser.parse_args()
+
+    if args.stub is not None:
+        uvicorn.run(stub_app(args.stub), host=args.host, port=args.port)
+    else:
+        if not args.backend:
+            parser.error("at least one --backend is required")
+        backends.extend(Backend(url) for url in args.backend)
+        uvicorn.run(app, host=args.host, port=args.port)
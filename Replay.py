@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""Whisper replay - re-drives a captured /transcribe trace and compares builds"""
+
+import argparse
+import asyncio
+import difflib
+import json
+import statistics
+import time
+from pathlib import Path
+
+import httpx
+
+
+def positive_float(value):
+    number = float(value)
+    if number <= 0:
+        raise argparse.ArgumentTypeError(f"must be greater than 0, got {value}")
+    return number
+
+
+def load_trace(path):
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+async def send(client, url, index, record, audio, results):
+    data = {k: str(v).lower() if isinstance(v, bool) else str(v)
+            for k, v in record["options"].items() if v is not None}
+    start = time.monotonic()
+    try:
+        response = await client.post(
+            f"{url}/transcribe", data=data,
+            files={"file": (record.get("filename") or "audio.webm", audio)},
+        )
+    except httpx.HTTPError as e:
+        body, status = {"error": str(e)}, None
+    else:
+        status = response.status_code
+        try:
+            body = response.json()
+        except ValueError:
+            body = None
+        if not isinstance(body, dict):
+            # e.g. a plain-text 500 from a proxy or a crashed worker
+            body = {"error": response.text}
+    results.append({
+        "index": index,
+        "sha256": record["sha256"],
+        "status": status,
+        "latency": round(time.monotonic() - start, 3),
+        "captured_latency": record.get("processing_time"),
+        "model": body.get("model"),
+        "text": body.get("text"),
+        "error": body.get("error"),
+    })
+
+
+async def replay(trace_path, url, speed, audio_dir, out_path):
+    """Send every traced request at its original arrival offset divided by `speed`."""
+    trace = load_trace(trace_path)
+    audio_dir = Path(audio_dir) if audio_dir else Path(trace_path).with_suffix(".audio")
+    playable = [(i, r) for i, r in enumerate(trace) if (audio_dir / r["sha256"]).exists()]
+    if len(playable) < len(trace):
+        print(f"Skipping {len(trace) - len(playable)} requests without captured audio")
+    if not playable:
+        return
+
+    results = []
+    first = playable[0][1]["arrival"]
+    async with httpx.AsyncClient(timeout=None) as client:
+        start = time.monotonic()
+        tasks = []
+        for index, record in playable:
+            delay = (record["arrival"] - first) / speed - (time.monotonic() - start)
+            if delay > 0:
+                await asyncio.sleep(delay)
+            audio = (audio_dir / record["sha256"]).read_bytes()
+            tasks.append(asyncio.create_task(send(client, url, index, record, audio, results)))
+        await asyncio.gather(*tasks)
+
+    results.sort(key=lambda r: r["index"])
+    with open(out_path, "w") as f:
+        for result in results:
+            f.write(json.dumps(result) + "\n")
+    print(f"Replayed {len(results)} requests in {time.monotonic() - start:.1f}s -> {out_path}")
+    print_latency(out_path, [r["latency"] for r in results if r["status"] == 200])
+
+
+def percentiles(latencies):
+    if len(latencies) < 2:
+        return {"p50": latencies[0], "p90": latencies[0], "p99": latencies[0]} if latencies else {}
+    cuts = statistics.quantiles(latencies, n=100, method="inclusive")
+    return {"p50": cuts[49], "p90": cuts[89], "p99": cuts[98]}
+
+
+def print_latency(label, latencies):
+    stats = percentiles(latencies)
+    summary = "  ".join(f"{k}={v:.2f}s" for k, v in stats.items())
+    print(f"{label}: n={len(latencies)}  {summary}")
+
+
+def compare(baseline_path, candidate_path, show):
+    """Print latency percentiles of two replays and the transcripts that changed."""
+    baseline = {r["index"]: r for r in load_trace(baseline_path)}
+    candidate = {r["index"]: r for r in load_trace(candidate_path)}
+    common = sorted(baseline.keys() & candidate.keys())
+
+    # Only requests that succeeded in both runs, so failures can't make a build look faster
+    ok = [i for i in common if baseline[i]["status"] == 200 and candidate[i]["status"] == 200]
+    a = percentiles([baseline[i]["latency"] for i in ok])
+    b = percentiles([candidate[i]["latency"] for i in ok])
+    print(f"Latency over {len(ok)} requests that succeeded in both runs")
+    print(f"{'':6}{'baseline':>10}{'candidate':>11}{'change':>9}")
+    for key in (k for k in a if k in b):
+        change = (b[key] - a[key]) / a[key] * 100 if a[key] else 0.0
+        print(f"{key:6}{a[key]:>9.2f}s{b[key]:>10.2f}s{change:>+8.1f}%")
+
+    changed = []
+    for i in common:
+        old, new = baseline[i]["text"] or "", candidate[i]["text"] or ""
+        if old != new:
+            ratio = difflib.SequenceMatcher(None, old.split(), new.split()).ratio()
+            changed.append((ratio, i, old, new))
+    failed_a = sum(1 for i in common if baseline[i]["status"] != 200)
+    failed_b = sum(1 for i in common if candidate[i]["status"] != 200)
+    print(f"\n{len(common)} requests, {len(changed)} transcripts changed, "
+          f"{failed_a} failed in baseline, {failed_b} failed in candidate")
+
+    for ratio, i, old, new in sorted(changed)[:show]:
+        print(f"\n#{i} ({baseline[i]['sha256'][:12]}) word similarity {ratio:.2f}")
+        for line in difflib.unified_diff(old.split(), new.split(), lineterm="", n=2):
+            if not line.startswith(("---", "+++", "@@")):
+                print(f"  {line}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run = commands.add_parser("run", help="Replay a captured trace against an instance")
+    run.add_argument("trace", help="JSONL trace written by App.py (CAPTURE_TRACE)")
+    run.add_argument("--url", default="http://127.0.0.1:8000")
+    run.add_argument("--speed", type=positive_float, default=1.0,
+                     help="Arrival rate multiplier, e.g. 2.0 replays twice as fast")
+    run.add_argument("--audio-dir", help="Captured audio directory (default: <trace>.audio)")
+    run.add_argument("--out", required=True, help="Where to write the replay results")
+
+    diff = commands.add_parser("compare", help="Compare the results of two replays")
+    diff.add_argument("baseline")
+    diff.add_argument("candidate")
+    diff.add_argument("--show", type=int, default=10, help="Transcript diffs to print")
+
+    args = parser.parse_args()
+    if args.command == "run":
+        asyncio.run(replay(args.trace, args.url, args.speed, args.audio_dir, args.out))
+    else:
+        compare(args.baseline, args.candidate, args.show)